@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.methods import GetUpdates, SendMessage
+from aiolimiter import AsyncLimiter
+
+from config import Config
+
+API_RATE_LIMIT = 29  # Bot API calls per second (Telegram allows ~30)
+GROUP_SEND_RATE_LIMIT = 20  # Messages per minute to a single group
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Token buckets for outgoing Bot API calls, so bursts wait instead of hitting 429s"""
+    
+    def __init__(self, rate: int = API_RATE_LIMIT, group_rate: int = GROUP_SEND_RATE_LIMIT):
+        self._limiter = AsyncLimiter(rate, 1)
+        self._group_limiters: defaultdict[int, AsyncLimiter] = defaultdict(lambda: AsyncLimiter(group_rate, 60))
+    
+    async def __call__(self, make_request, bot, method):
+        # Long polling is a single outstanding call, not traffic to throttle
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+        
+        if isinstance(method, SendMessage) and isinstance(method.chat_id, int) and method.chat_id < 0:
+            await self._group_limiters[method.chat_id].acquire()
+        
+        async with self._limiter:
+            return await make_request(bot, method)
+
+def make_bot(token: str, **kwargs) -> Bot:
+    """Create a Bot backed by an aiohttp session sized for bursty API traffic"""
+    session = AiohttpSession(limit=Config.BOT_SESSION_LIMIT)
+    session.middleware(RateLimitMiddleware())
+    return Bot(token=token, session=session, **kwargs)
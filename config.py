@@ -7,9 +7,12 @@ class Config:
     BOT_TOKEN = os.getenv('BOT_TOKEN')
     SUPERADMIN_ID = int(os.getenv('SUPERADMIN_ID', 0))
     DATABASE_NAME = 'bot_database.db'
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 4))  # Read-only connections in the pool
+    BOT_SESSION_LIMIT = int(os.getenv('BOT_SESSION_LIMIT', 100))  # Simultaneous HTTP connections to the Bot API
     
     # Bot settings
     BOT_USERNAME = None  # Will be set dynamically
+    POLLING_TIMEOUT = int(os.getenv('POLLING_TIMEOUT', 30))  # Long-polling timeout in seconds (Telegram max is 50)
     
     @classmethod
     def validate(cls):
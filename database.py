@@ -1,10 +1,83 @@
+import asyncio
 import aiosqlite
+from contextlib import asynccontextmanager
 from typing import List, Dict, Optional
 from config import Config
 
+# Applied to every pooled connection
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'cache_size=-64000',  # 64 MB page cache
+    'mmap_size=268435456',  # 256 MB memory-mapped I/O
+    'busy_timeout=5000',  # Wait up to 5 s for a lock held by another connection
+)
+
+class AioSqlitePool:
+    """One writer connection plus a queue of read-only connections (WAL mode)"""
+    
+    def __init__(self, db_path: str, readers: int = 4):
+        self.db_path = db_path
+        self.readers = readers
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._reader_queue: asyncio.Queue = asyncio.Queue()
+        self._connections: List[aiosqlite.Connection] = []
+    
+    async def _open_connection(self, *extra_pragmas: str) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path)
+        for pragma in SQLITE_PRAGMAS + extra_pragmas:
+            await conn.execute(f'PRAGMA {pragma}')
+        self._connections.append(conn)
+        return conn
+    
+    async def open(self):
+        """Open the writer first (it switches the file to WAL), then the readers"""
+        self._writer = await self._open_connection()
+        for _ in range(self.readers):
+            self._reader_queue.put_nowait(await self._open_connection('query_only=1'))
+    
+    async def close(self):
+        """Close every pooled connection"""
+        for conn in self._connections:
+            await conn.close()
+        self._connections.clear()
+        self._writer = None
+        self._reader_queue = asyncio.Queue()
+    
+    @asynccontextmanager
+    async def acquire_reader(self):
+        """Borrow a read-only connection"""
+        conn = await self._reader_queue.get()
+        try:
+            yield conn
+        finally:
+            self._reader_queue.put_nowait(conn)
+    
+    @asynccontextmanager
+    async def acquire_writer(self):
+        """Get exclusive use of the writer connection"""
+        async with self._write_lock:
+            yield self._writer
+
 class Database:
     def __init__(self):
         self.db_path = Config.DATABASE_NAME
+        self.pool: Optional[AioSqlitePool] = None
+    
+    async def connect(self):
+        """Open the shared connection pool"""
+        if self.pool is not None:
+            return
+        self.pool = AioSqlitePool(self.db_path, Config.DB_POOL_SIZE)
+        await self.pool.open()
+    
+    async def close(self):
+        """Close the shared connection pool"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
     
     async def init_database(self):
         """Initialize database with required tables"""
@@ -16,10 +89,20 @@ class Database:
                     title TEXT NOT NULL,
                     username TEXT,
                     added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE
+                    is_active BOOLEAN DEFAULT TRUE,
+                    bot_status TEXT,
+                    bot_status_at TIMESTAMP
                 )
             ''')
             
+            # Add bot_status columns to databases created before they existed
+            cursor = await db.execute('PRAGMA table_info(groups)')
+            columns = [row[1] for row in await cursor.fetchall()]
+            if 'bot_status' not in columns:
+                await db.execute('ALTER TABLE groups ADD COLUMN bot_status TEXT')
+            if 'bot_status_at' not in columns:
+                await db.execute('ALTER TABLE groups ADD COLUMN bot_status_at TIMESTAMP')
+            
             # Group members table for mention validation
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS group_members (
@@ -60,13 +143,14 @@ class Database:
             
             await db.commit()
     
-    async def add_group(self, group_id: int, title: str, username: str = None) -> bool:
+    async def add_group(self, group_id: int, title: str, username: str = None, bot_status: str = None) -> bool:
         """Add a new group to database"""
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 await db.execute(
-                    'INSERT OR REPLACE INTO groups (id, title, username) VALUES (?, ?, ?)',
-                    (group_id, title, username)
+                    'INSERT OR REPLACE INTO groups (id, title, username, bot_status, bot_status_at) '
+                    'VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)',
+                    (group_id, title, username, bot_status)
                 )
                 await db.execute(
                     'INSERT OR IGNORE INTO group_settings (group_id) VALUES (?)',
@@ -99,6 +183,15 @@ class Database:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
     
+    async def update_group_bot_status(self, group_id: int, status: str):
+        """Cache the bot's own membership status in a group"""
+        async with self.pool.acquire_writer() as db:
+            await db.execute(
+                'UPDATE groups SET bot_status = ?, bot_status_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (status, group_id)
+            )
+            await db.commit()
+    
     async def update_group_member(self, group_id: int, user_id: int, username: str = None, 
                                 first_name: str = None, last_name: str = None, is_verified: bool = True):
         """Update or add group member with verification status"""
@@ -225,4 +318,17 @@ class Database:
                    AND updated_at < datetime('now', '-{} days')'''.format(days_old),
                 (group_id,)
             )
-            await db.commit()
\ No newline at end of file
+            await db.commit()
+    
+    async def cleanup_unverified_users_all(self, days_old: int = 7) -> int:
+        """Remove unverified users older than specified days from every active group in one statement"""
+        async with self.pool.acquire_writer() as db:
+            cursor = await db.execute(
+                '''DELETE FROM group_members 
+                   WHERE is_verified = FALSE 
+                   AND updated_at < datetime('now', ?)
+                   AND group_id IN (SELECT id FROM groups WHERE is_active = TRUE)''',
+                (f'-{days_old} days',)
+            )
+            await db.commit()
+            return cursor.rowcount
@@ -1,16 +1,50 @@
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery, ChatMemberUpdated
-from aiogram.filters import Command, ChatMemberUpdatedFilter, KICKED, LEFT, MEMBER, RESTRICTED, ADMINISTRATOR, CREATOR
+from aiogram.filters import (
+    Command, ChatMemberUpdatedFilter, KICKED, LEFT, MEMBER, RESTRICTED, ADMINISTRATOR, CREATOR,
+    JOIN_TRANSITION, LEAVE_TRANSITION, PROMOTED_TRANSITION
+)
 from aiogram.enums import ChatType, ContentType
 from aiogram.exceptions import TelegramBadRequest
 import logging
 import asyncio
+import time
 
 from config import Config
 from database import Database
 from keyboards import Keyboards
 from utils import MessageAnalyzer, TextFormatter
 from admin_handlers import AdminHandlers
+from membership_cache import MembershipCache
+
+ADMIN_CACHE_TTL = 60  # Seconds to trust a fetched administrator list
+
+# /test_ad replies, with and without is_potential_ad_debug details
+TEST_AD_DEBUG_TEMPLATE = """
+    🧪 **AD DETECTION TEST**
+
+    📝 **Text:** `{preview}`
+
+    📊 **Results:**
+    • Is Ad: {verdict}
+    • Debug Score: {score} (checks tripped)
+    • Reason: {reason}
+
+    🎯 **Action:** {action}
+            """
+
+TEST_AD_TEMPLATE = """
+    🧪 **AD DETECTION TEST**
+
+    📝 **Text:** `{preview}`
+
+    📊 **Results:**
+    • Is Ad: {verdict}
+
+    🎯 **Action:** {action}
+
+    ⚠️ **Note:** Debug version not available
+            """
 
 class BotHandlers:
     def __init__(self, bot: Bot, db: Database):
@@ -18,6 +52,8 @@ class BotHandlers:
         self.db = db
         self.router = Router()
         self.admin_handlers = AdminHandlers(bot, db)
+        self.membership_cache = MembershipCache()
+        self._admin_cache: dict[int, tuple[float, dict]] = {}  # chat_id -> (fetched_at, username -> admin member)
         self._setup_handlers()
     
     def _setup_handlers(self):
@@ -34,8 +70,11 @@ class BotHandlers:
         # Group handlers - EDITED MESSAGES (NEW!)
         self.router.edited_message.register(self.handle_edited_group_message, F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}))
         
-        # Member update handlers
-        self.router.chat_member.register(self.handle_member_update, ChatMemberUpdatedFilter(member_status_changed=True))
+        # Member update handlers (chat_member updates, one registration per transition)
+        self.router.chat_member.register(self.handle_member_update, ChatMemberUpdatedFilter(JOIN_TRANSITION))
+        self.router.chat_member.register(self.handle_member_update, ChatMemberUpdatedFilter(LEAVE_TRANSITION))
+        self.router.chat_member.register(self.handle_member_update, ChatMemberUpdatedFilter(PROMOTED_TRANSITION))
+        self.router.chat_member.register(self.handle_member_update, ChatMemberUpdatedFilter(ADMINISTRATOR >> (MEMBER | RESTRICTED)))
         
         # Callback handlers
         self.router.callback_query.register(self.handle_admin_callback, F.data.startswith("admin_"))
@@ -43,8 +82,8 @@ class BotHandlers:
         self.router.callback_query.register(self.handle_confirm_callback, F.data.startswith("confirm_"))
         self.router.callback_query.register(self.handle_cancel_callback, F.data.startswith("cancel_"))
         
-        # Bot added to group
-        self.router.my_chat_member.register(self.bot_added_to_group, ChatMemberUpdatedFilter(member_status_changed=True))
+        # Bot added to group (status changes are recorded by the dispatcher-level tracker)
+        self.router.my_chat_member.register(self.bot_added_to_group, ChatMemberUpdatedFilter(JOIN_TRANSITION))
     
     async def start_command(self, message: Message):
         """Handle /start command in private chat"""
@@ -230,8 +269,8 @@ Botni guruhingizga qo'shish uchun pastdagi tugmani bosing va admin huquqlarini b
             
             # Skip if user is admin
             try:
-                member = await self.bot.get_chat_member(message.chat.id, message.from_user.id)
-                if member.status in ['administrator', 'creator']:
+                member_status = await self.get_member_status(message.chat.id, message.from_user.id)
+                if member_status in ['administrator', 'creator']:
                     # Even for admins, update their info in database as verified
                     await self.db.update_group_member(
                         message.chat.id,
@@ -440,33 +479,17 @@ Botni guruhingizga qo'shish uchun pastdagi tugmani bosing va admin huquqlarini b
         # Test ad detection
         is_ad = MessageAnalyzer.is_potential_ad(fake_msg)
         
+        values = {
+            'preview': f"{test_text[:100]}{'...' if len(test_text) > 100 else ''}",
+            'verdict': '❌ YES' if is_ad else '✅ NO',
+            'action': '🗑️ Would DELETE' if is_ad else '✅ Would ALLOW',
+        }
+        
         if hasattr(MessageAnalyzer, 'is_potential_ad_debug'):
-            is_ad_debug, debug_reason, debug_score = MessageAnalyzer.is_potential_ad_debug(fake_msg)
-            result = f"""
-    🧪 **AD DETECTION TEST**
-
-    📝 **Text:** `{test_text[:100]}{'...' if len(test_text) > 100 else ''}`
-
-    📊 **Results:**
-    • Is Ad: {'❌ YES' if is_ad else '✅ NO'}
-    • Debug Score: {debug_score}/3+
-    • Reason: {debug_reason}
-
-    🎯 **Action:** {'🗑️ Would DELETE' if is_ad else '✅ Would ALLOW'}
-            """
+            is_ad_debug, values['reason'], values['score'] = MessageAnalyzer.is_potential_ad_debug(fake_msg)
+            result = TEST_AD_DEBUG_TEMPLATE.format_map(values)
         else:
-            result = f"""
-    🧪 **AD DETECTION TEST**
-
-    📝 **Text:** `{test_text[:100]}{'...' if len(test_text) > 100 else ''}`
-
-    📊 **Results:**
-    • Is Ad: {'❌ YES' if is_ad else '✅ NO'}
-
-    🎯 **Action:** {'🗑️ Would DELETE' if is_ad else '✅ Would ALLOW'}
-
-    ⚠️ **Note:** Debug version not available
-            """
+            result = TEST_AD_TEMPLATE.format_map(values)
         
         await message.answer(result, parse_mode="Markdown")
 
@@ -518,21 +541,19 @@ Botni guruhingizga qo'shish uchun pastdagi tugmani bosing va admin huquqlarini b
             
             # Method 1: Check if user is among chat administrators (most reliable)
             try:
-                administrators = await self.bot.get_chat_administrators(chat_id)
-                for admin in administrators:
-                    if (admin.user.username and 
-                        admin.user.username.lower() == username):
-                        # Found user in administrators, add to database
-                        await self.db.update_group_member(
-                            chat_id,
-                            admin.user.id,
-                            admin.user.username,
-                            admin.user.first_name,
-                            admin.user.last_name,
-                            True  # is_verified = True for admins
-                        )
-                        logging.info(f"Found @{username} in administrators and added to database")
-                        return True
+                admin = (await self.get_admins_by_username(chat_id)).get(username)
+                if admin:
+                    # Found user in administrators, add to database
+                    await self.db.update_group_member(
+                        chat_id,
+                        admin.user.id,
+                        admin.user.username,
+                        admin.user.first_name,
+                        admin.user.last_name,
+                        True  # is_verified = True for admins
+                    )
+                    logging.info(f"Found @{username} in administrators and added to database")
+                    return True
             except Exception as e:
                 logging.warning(f"Could not get administrators for chat {chat_id}: {e}")
             
@@ -571,9 +592,44 @@ Botni guruhingizga qo'shish uchun pastdagi tugmani bosing va admin huquqlarini b
             # In case of error, be restrictive to prevent spam
             return False
     
+    async def get_admins_by_username(self, chat_id: int) -> dict:
+        """Get chat administrators keyed by lowercase username, fetched at most once per ADMIN_CACHE_TTL"""
+        cached = self._admin_cache.get(chat_id)
+        now = time.monotonic()
+        if cached and now - cached[0] < ADMIN_CACHE_TTL:
+            return cached[1]
+        
+        administrators = await self.bot.get_chat_administrators(chat_id)
+        admins_by_username = {}
+        for admin in administrators:
+            self.membership_cache.set(chat_id, admin.user.id, admin.status)
+            if admin.user.username:
+                admins_by_username[admin.user.username.lower()] = admin
+        
+        self._admin_cache[chat_id] = (now, admins_by_username)
+        return admins_by_username
+    
+    async def get_member_status(self, chat_id: int, user_id: int) -> str:
+        """Get a member's status, served from the membership cache when fresh"""
+        status = self.membership_cache.get(chat_id, user_id)
+        if status is None:
+            member = await self.bot.get_chat_member(chat_id, user_id)
+            status = member.status
+            self.membership_cache.set(chat_id, user_id, status)
+        return status
+    
     async def handle_member_update(self, chat_member: ChatMemberUpdated):
         """Handle member join/leave events"""
         try:
+            # The update carries the authoritative new status
+            self.membership_cache.set(
+                chat_member.chat.id,
+                chat_member.new_chat_member.user.id,
+                chat_member.new_chat_member.status
+            )
+            if 'administrator' in (chat_member.old_chat_member.status, chat_member.new_chat_member.status):
+                self._admin_cache.pop(chat_member.chat.id, None)
+            
             settings = await self.db.get_group_settings(chat_member.chat.id)
             
             if chat_member.new_chat_member.status in [MEMBER, RESTRICTED, ADMINISTRATOR, CREATOR]:
@@ -603,14 +659,15 @@ Botni guruhingizga qo'shish uchun pastdagi tugmani bosing va admin huquqlarini b
     async def bot_added_to_group(self, chat_member: ChatMemberUpdated):
         """Handle bot being added to group"""
         try:
-            if (chat_member.new_chat_member.user.id == self.bot.id and 
+            if (chat_member.new_chat_member.user.id == self.bot.id and
                 chat_member.new_chat_member.status in ['administrator', 'member']):
-                
+
                 # Add group to database
                 await self.db.add_group(
                     chat_member.chat.id,
                     chat_member.chat.title,
-                    chat_member.chat.username
+                    chat_member.chat.username,
+                    chat_member.new_chat_member.status
                 )
                 
                 logging.info(f"Bot added to group: {chat_member.chat.title} ({chat_member.chat.id})")
@@ -737,8 +794,8 @@ Savollaringiz bo'lsa, guruh adminlariga murojaat qiling.
                     
                     # Skip messages from admins
                     try:
-                        member = await self.bot.get_chat_member(msg.chat.id, msg.from_user.id)
-                        if member.status in ['administrator', 'creator']:
+                        member_status = await self.get_member_status(msg.chat.id, msg.from_user.id)
+                        if member_status in ['administrator', 'creator']:
                             continue
                     except:
                         pass
@@ -1,9 +1,15 @@
 import asyncio
 import logging
+import math
+import queue
 import sys
-from datetime import datetime, timedelta
-from aiogram import Bot, Dispatcher
-from aiogram.enums import ParseMode
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from logging.handlers import QueueHandler, QueueListener
+from aiogram import Dispatcher, F
+from aiogram.enums import ParseMode, ChatType
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.client.default import DefaultBotProperties
 from aiogram.types import Message, ChatMemberUpdated
 from aiogram.filters import ChatMemberUpdatedFilter
@@ -11,19 +17,117 @@ from aiogram.filters import ChatMemberUpdatedFilter
 from config import Config
 from database import Database
 from handlers import BotHandlers
+from bot_factory import make_bot
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configure logging (once - re-imports must not open bot.log again).
+# Records go through a queue; a listener thread does the file/console writes off the event loop.
+_log_handler = None
+_log_listener = None
+if not logging.getLogger().hasHandlers():
+    _log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    _log_outputs = [logging.FileHandler('bot.log'), logging.StreamHandler(sys.stdout)]
+    for _output in _log_outputs:
+        _output.setFormatter(_log_formatter)
+    
+    _log_queue = queue.Queue(-1)
+    _log_handler = QueueHandler(_log_queue)
+    _log_listener = QueueListener(_log_queue, *_log_outputs)
+    
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(_log_handler)
+    _log_listener.start()
+    
+    # aiogram logs every handled update at INFO
+    logging.getLogger('aiogram').setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+def stop_log_listener():
+    """Flush queued log records and write any later ones directly"""
+    global _log_listener
+    if _log_listener is None:
+        return
+    _log_listener.stop()
+    root_logger = logging.getLogger()
+    root_logger.removeHandler(_log_handler)
+    for handler in _log_listener.handlers:
+        root_logger.addHandler(handler)
+    _log_listener = None
+
+JL_CACHE_MAX_SIZE = 10_000  # Max groups kept in the join/leave settings cache
+DELETE_BATCH_SIZE = 100  # deleteMessages accepts at most 100 ids per call
+DELETE_QUEUE_MAX_SIZE = 10_000  # Pending deletions kept before new ones are dropped
+DELETE_WORKERS = 4  # Tasks issuing deleteMessages calls
+DELETE_COALESCE_WINDOW = 0.05  # Seconds a worker waits to batch more deletions
+BOT_STATUS_TTL = 600  # Seconds to trust a bot status fetched from the API
+BOT_STATUS_DB_TTL = 86400  # Seconds the startup scan trusts a bot status stored in the database
+STARTUP_SCAN_CONCURRENCY = 10  # Groups checked in parallel during the startup scan
+HEALTH_CHECK_INTERVAL = 300  # Seconds between health checks
+HEALTH_STALE_AFTER = 600  # Seconds without updates before the health check calls get_me
+
+# Message fields that mark a group service message. Only the ones present in
+# model_fields_set are read; a re-validated update may list unset fields as None.
+_SERVICE_FIELDS = frozenset({
+    'group_chat_created', 'supergroup_chat_created', 'new_chat_title', 'new_chat_photo',
+    'delete_chat_photo', 'migrate_to_chat_id', 'migrate_from_chat_id', 'pinned_message',
+})
+
+# Message templates, filled with str.format_map
+STARTUP_MSG_TEMPLATE = (
+    "🤖 **Bot ishga tushdi!**\n\n"
+    "⏰ **Vaqt:** {time}\n\n"
+    "🛡️ **Faol himoya:**\n"
+    "• ✅ Linklar va reklamalar\n"
+    "• ✅ Begona mention lar\n"
+    "• ✅ Tahrirlangan xabarlar\n"
+    "• {jl} Join/Leave xabarlar\n\n"
+    "💡 Admin buyruqlar:\n"
+    "• `/clean` - guruhni tekshirish\n"
+    "• `/joinleave` - join/leave sozlamalari\n\n"
+    "Guruh xavfsizligi ta'minlanmoqda! 🔒"
+)
+
+STARTUP_SUMMARY_TEMPLATE = """
+🚀 **Bot Successfully Started!**
+
+📊 **Startup Summary:**
+• Total groups: {total}
+• Active groups: {active}
+• Inactive groups: {inactive}
+• Notifications sent: {notified}
+
+⏰ **Start time:** {time}
+
+🛡️ **Protection Status:**
+• Link detection: ✅ Active
+• Ad detection: ✅ Active
+• Mention validation: ✅ Active
+• Edited message check: ✅ Active
+• Join/Leave cleanup: ✅ Active
+
+🤖 **Bot Info:**
+• Username: @{username}
+• Version: Enhanced v2.1 (with Join/Leave Remover)
+• Features: All systems operational
+
+Ready to protect your groups! 🔒
+"""
+
+SHUTDOWN_MSG_TEMPLATE = """
+🛑 **Bot Shutting Down**
+
+⏰ **Shutdown time:** {time}
+📊 **Uptime:** {uptime}
+
+🤖 **Bot:** @{username}
+💾 **Database:** Connections closed
+👥 **Join/Leave Remover:** Stopped
+🔄 **Status:** Graceful shutdown
+
+Bot will be offline until restart. 🔄
+"""
+
 class TelegramBot:
     def __init__(self):
         self.config = Config
@@ -33,6 +137,11 @@ class TelegramBot:
         self.handlers = None
         self.startup_time = datetime.now()
         self.join_leave_enabled_groups = set()  # Track groups with join/leave removal enabled
+        self._jl_cache: dict[int, bool] = {}  # group_id -> join/leave removal enabled
+        self._delete_q: asyncio.Queue[tuple[int, int]] = asyncio.Queue(maxsize=DELETE_QUEUE_MAX_SIZE)  # (chat_id, message_id)
+        self._bot_status: dict[int, tuple[str, float]] = {}  # chat_id -> (bot status, expires_at)
+        self._bg_tasks: set[asyncio.Task] = set()  # Strong refs so detached tasks aren't garbage collected
+        self._last_update_ts = 0.0  # loop.time() of the last update received
     
     async def initialize(self):
         """Initialize bot components"""
@@ -45,13 +154,14 @@ class TelegramBot:
             
             # Initialize database
             await self.db.init_database()
+            await self.db.connect()
             logger.info("✅ Database initialized successfully")
             
             # Initialize join/leave settings table
             await self.init_join_leave_settings()
             
             # Create bot instance
-            self.bot = Bot(
+            self.bot = make_bot(
                 token=self.config.BOT_TOKEN,
                 default=DefaultBotProperties(parse_mode=ParseMode.HTML)
             )
@@ -68,20 +178,22 @@ class TelegramBot:
             self.handlers = BotHandlers(self.bot, self.db)
             logger.info("✅ Handlers initialized")
             
+            # Remember when the last update arrived (used by health_check)
+            self.dp.update.outer_middleware(self.track_last_update)
+            
             # Include router
             self.dp.include_router(self.handlers.router)
             
             # Register join/leave message handlers
             await self.register_join_leave_handlers()
             
-            # Add broadcast message handler
+            # Add broadcast message handler (magic filters are checked before the handler is entered)
             self.dp.message.register(
                 self.handlers.admin_handlers.handle_broadcast_message,
-                lambda message: (
-                    message.from_user.id == self.config.SUPERADMIN_ID and
-                    message.from_user.id in self.handlers.admin_handlers.broadcast_waiting and
-                    message.text
-                )
+                F.chat.type == ChatType.PRIVATE,
+                F.from_user.id == self.config.SUPERADMIN_ID,
+                F.from_user.id.in_(self.handlers.admin_handlers.broadcast_waiting),
+                F.text
             )
             
             logger.info("✅ Bot components initialized successfully")
@@ -96,8 +208,7 @@ class TelegramBot:
     async def init_join_leave_settings(self):
         """Initialize database table for join/leave settings"""
         try:
-            import aiosqlite
-            async with aiosqlite.connect(self.db.db_path) as db:
+            async with self.db.pool.acquire_writer() as db:
                 await db.execute('''
                     CREATE TABLE IF NOT EXISTS join_leave_settings (
                         group_id INTEGER PRIMARY KEY,
@@ -118,30 +229,30 @@ class TelegramBot:
     async def register_join_leave_handlers(self):
         """Register handlers for join/leave messages"""
         try:
-            # Handler for new chat members (join messages)
-            @self.dp.message()
-            async def handle_new_member(message: Message):
+            # Single entry for join, leave and other service messages in groups
+            @self.dp.message(F.chat.type.in_({ChatType.GROUP, ChatType.SUPERGROUP}))
+            async def handle_group_service(message: Message):
                 if message.new_chat_members:
                     await self.handle_join_message(message)
-            
-            # Handler for left chat members (leave messages)  
-            @self.dp.message()
-            async def handle_left_member(message: Message):
-                if message.left_chat_member:
+                elif message.left_chat_member:
                     await self.handle_leave_message(message)
-            
-            # Handler for service messages (group created, title changed, etc.)
-            @self.dp.message()
-            async def handle_service_message(message: Message):
-                if (message.group_chat_created or 
-                    message.supergroup_chat_created or
-                    message.new_chat_title or
-                    message.new_chat_photo or
-                    message.delete_chat_photo or
-                    message.migrate_to_chat_id or
-                    message.migrate_from_chat_id or
-                    message.pinned_message):
+                elif any(getattr(message, field) for field in _SERVICE_FIELDS.intersection(message.model_fields_set)):
                     await self.handle_service_message_removal(message)
+                else:
+                    # Regular messages go on to the moderation router
+                    raise SkipHandler()
+            
+            # Track the bot's own status from my_chat_member updates
+            @self.dp.my_chat_member()
+            async def track_bot_status(update: ChatMemberUpdated):
+                self._bot_status[update.chat.id] = (update.new_chat_member.status, math.inf)
+                # Remember the latest status so the startup scan can skip get_chat_member
+                try:
+                    await self.db.update_group_bot_status(update.chat.id, update.new_chat_member.status)
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not store bot status for {update.chat.id}: {e}")
+                # Let BotHandlers.bot_added_to_group handle joins as well
+                raise SkipHandler()
             
             logger.info("✅ Join/leave handlers registered")
             
@@ -154,17 +265,14 @@ class TelegramBot:
             if not await self.is_join_leave_enabled(message.chat.id):
                 return
             
-            # Log the join
-            members = ", ".join([f"@{member.username}" if member.username else member.first_name 
-                               for member in message.new_chat_members])
-            logger.info(f"👥 New members joined {message.chat.title}: {members}")
+            # Log the join (skip building the names when INFO is off)
+            if logger.isEnabledFor(logging.INFO):
+                members = ", ".join(f"@{member.username}" if member.username else member.first_name
+                                    for member in message.new_chat_members)
+                logger.info(f"👥 New members joined {message.chat.title}: {members}")
             
-            # Delete the join message
-            try:
-                await message.delete()
-                logger.debug(f"🗑️ Deleted join message in {message.chat.title}")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not delete join message: {e}")
+            # Queue the join message for batched deletion
+            self.queue_message_deletion(message)
             
         except Exception as e:
             logger.error(f"❌ Error handling join message: {e}")
@@ -175,17 +283,14 @@ class TelegramBot:
             if not await self.is_join_leave_enabled(message.chat.id):
                 return
             
-            # Log the leave
-            left_member = message.left_chat_member
-            member_name = f"@{left_member.username}" if left_member.username else left_member.first_name
-            logger.info(f"👋 Member left {message.chat.title}: {member_name}")
+            # Log the leave (skip building the name when INFO is off)
+            if logger.isEnabledFor(logging.INFO):
+                left_member = message.left_chat_member
+                member_name = f"@{left_member.username}" if left_member.username else left_member.first_name
+                logger.info(f"👋 Member left {message.chat.title}: {member_name}")
             
-            # Delete the leave message
-            try:
-                await message.delete()
-                logger.debug(f"🗑️ Deleted leave message in {message.chat.title}")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not delete leave message: {e}")
+            # Queue the leave message for batched deletion
+            self.queue_message_deletion(message)
             
         except Exception as e:
             logger.error(f"❌ Error handling leave message: {e}")
@@ -198,44 +303,132 @@ class TelegramBot:
             
             # Check if bot is admin (needed to delete messages)
             try:
-                bot_member = await self.bot.get_chat_member(message.chat.id, self.bot.id)
-                if bot_member.status not in ['administrator']:
+                if await self.get_bot_status(message.chat.id) not in ['administrator']:
                     return
             except:
                 return
             
-            # Delete service message after a short delay
-            await asyncio.sleep(2)
-            try:
-                await message.delete()
-                logger.debug(f"🗑️ Deleted service message in {message.chat.title}")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not delete service message: {e}")
+            # Delete service message after a short delay without holding up the handler
+            self.spawn_task(self.queue_message_deletion_after_delay(message, 2))
             
         except Exception as e:
             logger.error(f"❌ Error handling service message: {e}")
     
+    async def get_bot_status(self, chat_id: int) -> str:
+        """Get the bot's status in a chat, calling the API only on a cache miss"""
+        now = asyncio.get_running_loop().time()
+        cached = self._bot_status.get(chat_id)
+        if cached and cached[1] > now:
+            return cached[0]
+        
+        bot_member = await self.bot.get_chat_member(chat_id, self.bot.id)
+        self._bot_status[chat_id] = (bot_member.status, now + BOT_STATUS_TTL)
+        return bot_member.status
+    
+    def queue_message_deletion(self, message: Message):
+        """Queue a message for the delete workers"""
+        try:
+            self._delete_q.put_nowait((message.chat.id, message.message_id))
+        except asyncio.QueueFull:
+            logger.warning(f"⚠️ Delete queue full, dropping message {message.message_id} in {message.chat.id}")
+    
+    async def queue_message_deletion_after_delay(self, message: Message, delay: int):
+        """Queue a message for deletion once the delay has passed"""
+        await asyncio.sleep(delay)
+        self.queue_message_deletion(message)
+    
+    def spawn_task(self, coro) -> asyncio.Task:
+        """Run a coroutine as a detached task, keeping a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+        return task
+    
+    async def delete_message_batches(self, batches: dict[int, list[int]]):
+        """Delete messages grouped by chat, up to 100 per request"""
+        for chat_id, message_ids in batches.items():
+            for i in range(0, len(message_ids), DELETE_BATCH_SIZE):
+                batch = message_ids[i:i + DELETE_BATCH_SIZE]
+                try:
+                    await self.bot.delete_messages(chat_id, batch)
+                    logger.debug(f"🗑️ Deleted {len(batch)} join/leave/service messages in {chat_id}")
+                except TelegramBadRequest:
+                    # Retry one by one so a single bad id doesn't keep the rest
+                    for message_id in batch:
+                        try:
+                            await self.bot.delete_message(chat_id, message_id)
+                        except Exception as e:
+                            logger.warning(f"⚠️ Could not delete message {message_id} in {chat_id}: {e}")
+                except Exception as e:
+                    logger.warning(f"⚠️ Could not delete {len(batch)} messages in {chat_id}: {e}")
+    
+    async def flush_delete_queue(self):
+        """Delete everything still waiting in the delete queue"""
+        batches = defaultdict(list)
+        while not self._delete_q.empty():
+            chat_id, message_id = self._delete_q.get_nowait()
+            batches[chat_id].append(message_id)
+        await self.delete_message_batches(batches)
+    
+    async def delete_worker(self):
+        """Background worker deleting queued messages, coalescing a short burst into batched calls"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                chat_id, message_id = await self._delete_q.get()
+                batches = defaultdict(list)
+                batches[chat_id].append(message_id)
+                count = 1
+                
+                # Collect whatever else arrives within the coalescing window
+                deadline = loop.time() + DELETE_COALESCE_WINDOW
+                while count < DELETE_BATCH_SIZE and (timeout := deadline - loop.time()) > 0:
+                    try:
+                        chat_id, message_id = await asyncio.wait_for(self._delete_q.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    batches[chat_id].append(message_id)
+                    count += 1
+                
+                await self.delete_message_batches(batches)
+                
+            except Exception as e:
+                logger.error(f"❌ Error in delete worker: {e}")
+    
+    def _cache_join_leave(self, group_id: int, enabled: bool):
+        """Remember a group's join/leave setting, evicting the oldest entry when full"""
+        if group_id not in self._jl_cache and len(self._jl_cache) >= JL_CACHE_MAX_SIZE:
+            self._jl_cache.pop(next(iter(self._jl_cache)))
+        self._jl_cache[group_id] = enabled
+    
     async def is_join_leave_enabled(self, group_id: int) -> bool:
         """Check if join/leave removal is enabled for a group"""
+        if group_id in self._jl_cache:
+            return self._jl_cache[group_id]
+        
         try:
-            import aiosqlite
-            async with aiosqlite.connect(self.db.db_path) as db:
+            async with self.db.pool.acquire_reader() as db:
                 cursor = await db.execute(
                     'SELECT enabled FROM join_leave_settings WHERE group_id = ?',
                     (group_id,)
                 )
                 result = await cursor.fetchone()
-                
-                if result is None:
-                    # Enable by default for new groups
+            
+            if result is None:
+                # Enable by default for new groups
+                async with self.db.pool.acquire_writer() as db:
+                    # OR IGNORE keeps a value written concurrently instead of resetting it
                     await db.execute(
-                        'INSERT OR REPLACE INTO join_leave_settings (group_id, enabled) VALUES (?, TRUE)',
+                        'INSERT OR IGNORE INTO join_leave_settings (group_id, enabled) VALUES (?, TRUE)',
                         (group_id,)
                     )
                     await db.commit()
-                    return True
-                
-                return bool(result[0])
+                self._cache_join_leave(group_id, True)
+                return True
+            
+            enabled = bool(result[0])
+            self._cache_join_leave(group_id, enabled)
+            return enabled
                 
         except Exception as e:
             logger.error(f"❌ Error checking join/leave settings: {e}")
@@ -244,8 +437,7 @@ class TelegramBot:
     async def toggle_join_leave_removal(self, group_id: int, enabled: bool = None) -> bool:
         """Toggle join/leave removal for a group"""
         try:
-            import aiosqlite
-            async with aiosqlite.connect(self.db.db_path) as db:
+            async with self.db.pool.acquire_writer() as db:
                 if enabled is None:
                     # Toggle current state
                     cursor = await db.execute(
@@ -261,8 +453,9 @@ class TelegramBot:
                     (group_id, enabled)
                 )
                 await db.commit()
-                
-                return enabled
+            
+            self._cache_join_leave(group_id, enabled)
+            return enabled
                 
         except Exception as e:
             logger.error(f"❌ Error toggling join/leave removal: {e}")
@@ -273,8 +466,7 @@ class TelegramBot:
         try:
             # Check if bot has admin rights
             try:
-                bot_member = await self.bot.get_chat_member(group_id, self.bot.id)
-                if bot_member.status not in ['administrator']:
+                if await self.get_bot_status(group_id) not in ['administrator']:
                     logger.warning(f"⚠️ Bot is not admin in group {group_id}, cannot clean history")
                     return 0
             except Exception as e:
@@ -343,76 +535,53 @@ class TelegramBot:
             
             logger.info(f"📊 Found {len(groups)} groups to check")
             
-            active_groups = 0
-            inactive_groups = 0
-            notified_groups = 0
+            # Startup notification text for groups with join/leave removal on and off
+            start_time = self.startup_time.strftime('%d.%m.%Y %H:%M:%S')
+            startup_texts = {
+                enabled: STARTUP_MSG_TEMPLATE.format_map({'time': start_time, 'jl': '✅' if enabled else '❌'})
+                for enabled in (True, False)
+            }
+            
+            # Check groups concurrently, a bounded number at a time to stay within rate limits
+            sem = asyncio.Semaphore(STARTUP_SCAN_CONCURRENCY)
+            results = await asyncio.gather(
+                *(self._scan_group(group, sem, startup_texts) for group in groups),
+                return_exceptions=True
+            )
             
-            for group in groups:
-                try:
-                    group_id = group['id']
-                    group_title = group['title']
-                    
-                    logger.info(f"🔍 Checking group: {group_title} ({group_id})")
-                    
-                    # Check if bot has access to this group
-                    try:
-                        bot_member = await self.bot.get_chat_member(group_id, self.bot.id)
-                        
-                        if bot_member.status in ['administrator', 'member']:
-                            active_groups += 1
-                            
-                            # Initialize join/leave settings for this group
-                            await self.is_join_leave_enabled(group_id)  # This will create default settings
-                            
-                            # Send startup notification to group (only if bot has admin rights)
-                            if bot_member.status == 'administrator':
-                                try:
-                                    join_leave_status = await self.is_join_leave_enabled(group_id)
-                                    
-                                    startup_msg = await self.bot.send_message(
-                                        group_id,
-                                        f"🤖 **Bot ishga tushdi!**\n\n"
-                                        f"⏰ **Vaqt:** {self.startup_time.strftime('%d.%m.%Y %H:%M:%S')}\n\n"
-                                        f"🛡️ **Faol himoya:**\n"
-                                        f"• ✅ Linklar va reklamalar\n"
-                                        f"• ✅ Begona mention lar\n"
-                                        f"• ✅ Tahrirlangan xabarlar\n"
-                                        f"• {'✅' if join_leave_status else '❌'} Join/Leave xabarlar\n\n"
-                                        f"💡 Admin buyruqlar:\n"
-                                        f"• `/clean` - guruhni tekshirish\n"
-                                        f"• `/joinleave` - join/leave sozlamalari\n\n"
-                                        f"Guruh xavfsizligi ta'minlanmoqda! 🔒",
-                                        parse_mode=ParseMode.MARKDOWN
-                                    )
-                                    
-                                    notified_groups += 1
-                                    
-                                    # Auto-delete notification after 15 seconds
-                                    asyncio.create_task(self.delete_after_delay_static(startup_msg, 15))
-                                    
-                                except Exception as e:
-                                    logger.warning(f"⚠️ Could not send startup message to {group_title}: {e}")
-                            
-                            # Clean up database for this group
-                            await self._cleanup_group_data(group_id)
-                            
-                        else:
-                            logger.warning(f"⚠️ Bot has unusual status in {group_title}: {bot_member.status}")
-                            inactive_groups += 1
-                            
-                    except Exception as e:
-                        logger.warning(f"⚠️ Cannot access group {group_title}: {e}")
-                        inactive_groups += 1
-                        
-                        # Mark group as inactive
-                        await self._mark_group_inactive(group_id)
-                    
-                    # Small delay between groups to avoid rate limiting
-                    await asyncio.sleep(1)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error checking group {group.get('title', 'Unknown')}: {e}")
+            active_ids, unreachable_ids = [], []
+            inactive_groups = notified_groups = 0
+            for group, result in zip(groups, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"❌ Error checking group {group.get('title', 'Unknown')}: {result}")
                     continue
+                active, notified, reachable = result
+                if active:
+                    active_ids.append(group['id'])
+                else:
+                    inactive_groups += 1
+                    if not reachable:
+                        unreachable_ids.append(group['id'])
+                notified_groups += notified
+            active_groups = len(active_ids)
+            
+            # Store group activity in one transaction
+            try:
+                async with self.db.pool.acquire_writer() as db:
+                    await db.executemany(
+                        'UPDATE groups SET is_active = TRUE WHERE id = ?',
+                        [(group_id,) for group_id in active_ids]
+                    )
+                    await db.executemany(
+                        'UPDATE groups SET is_active = FALSE WHERE id = ?',
+                        [(group_id,) for group_id in unreachable_ids]
+                    )
+                    await db.commit()
+                
+                # Remove unverified users older than 7 days
+                await self.db.cleanup_unverified_users_all(days_old=7)
+            except Exception as e:
+                logger.warning(f"⚠️ Error saving startup scan results: {e}")
             
             # Log summary
             logger.info(f"✅ Startup scan completed:")
@@ -424,31 +593,14 @@ class TelegramBot:
             # Send summary to superadmin
             if self.config.SUPERADMIN_ID:
                 try:
-                    summary_text = f"""
-🚀 **Bot Successfully Started!**
-
-📊 **Startup Summary:**
-• Total groups: {len(groups)}
-• Active groups: {active_groups}
-• Inactive groups: {inactive_groups}
-• Notifications sent: {notified_groups}
-
-⏰ **Start time:** {self.startup_time.strftime('%d.%m.%Y %H:%M:%S')}
-
-🛡️ **Protection Status:**
-• Link detection: ✅ Active
-• Ad detection: ✅ Active  
-• Mention validation: ✅ Active
-• Edited message check: ✅ Active
-• Join/Leave cleanup: ✅ Active
-
-🤖 **Bot Info:**
-• Username: @{self.config.BOT_USERNAME}
-• Version: Enhanced v2.1 (with Join/Leave Remover)
-• Features: All systems operational
-
-Ready to protect your groups! 🔒
-                    """
+                    summary_text = STARTUP_SUMMARY_TEMPLATE.format_map({
+                        'total': len(groups),
+                        'active': active_groups,
+                        'inactive': inactive_groups,
+                        'notified': notified_groups,
+                        'time': self.startup_time.strftime('%d.%m.%Y %H:%M:%S'),
+                        'username': self.config.BOT_USERNAME,
+                    })
                     
                     await self.bot.send_message(
                         self.config.SUPERADMIN_ID,
@@ -461,6 +613,72 @@ Ready to protect your groups! 🔒
         except Exception as e:
             logger.error(f"❌ Error in startup scan: {e}")
     
+    async def _scan_group(self, group: dict, sem: asyncio.Semaphore, startup_texts: dict[bool, str]) -> tuple[bool, bool, bool]:
+        """Check one group at startup, returning (is_active, was_notified, is_reachable)"""
+        async with sem:
+            group_id = group['id']
+            group_title = group['title']
+            
+            logger.info(f"🔍 Checking group: {group_title} ({group_id})")
+            
+            # Check if bot has access to this group
+            try:
+                # Use the status cached from my_chat_member updates, ask Telegram if unknown or stale
+                bot_status = group.get('bot_status')
+                checked_at = group.get('bot_status_at')
+                stale = checked_at is None or (
+                    datetime.now(timezone.utc) - datetime.fromisoformat(checked_at).replace(tzinfo=timezone.utc)
+                    > timedelta(seconds=BOT_STATUS_DB_TTL)
+                )
+                if bot_status is None or stale:
+                    bot_status = await self.get_bot_status(group_id)
+                    await self.db.update_group_bot_status(group_id, bot_status)
+                
+                # The bot was removed from the group; mark it inactive like an inaccessible one
+                if bot_status in ['left', 'kicked']:
+                    logger.warning(f"⚠️ Bot is no longer in {group_title}: {bot_status}")
+                    return False, False, False
+                
+                if bot_status not in ['administrator', 'member']:
+                    logger.warning(f"⚠️ Bot has unusual status in {group_title}: {bot_status}")
+                    return False, False, True
+                
+                # Read join/leave settings, creating the defaults if missing
+                join_leave_status = await self.is_join_leave_enabled(group_id)
+                
+                # Send startup notification to group (only if bot has admin rights)
+                notified = False
+                if bot_status == 'administrator':
+                    try:
+                        startup_msg = await self.bot.send_message(
+                            group_id,
+                            startup_texts[join_leave_status],
+                            parse_mode=ParseMode.MARKDOWN
+                        )
+                        
+                        notified = True
+                        
+                        # Auto-delete notification after 15 seconds
+                        self.spawn_task(self.delete_after_delay_static(startup_msg, 15))
+                        
+                    except TelegramForbiddenError as e:
+                        # The bot was removed since the status was stored
+                        logger.warning(f"⚠️ Bot is no longer in {group_title}: {e}")
+                        self._bot_status[group_id] = ('kicked', asyncio.get_running_loop().time() + BOT_STATUS_TTL)
+                        await self.db.update_group_bot_status(group_id, 'kicked')
+                        return False, False, False
+                    except Exception as e:
+                        logger.warning(f"⚠️ Could not send startup message to {group_title}: {e}")
+                
+                # Activity and member cleanup are written once after the scan
+                return True, notified, True
+                
+            except Exception as e:
+                logger.warning(f"⚠️ Cannot access group {group_title}: {e}")
+                
+                # Marked inactive once after the scan
+                return False, False, False
+    
     async def _cleanup_group_data(self, group_id: int):
         """Clean up invalid data in database for a group"""
         try:
@@ -468,8 +686,7 @@ Ready to protect your groups! 🔒
             await self.db.cleanup_unverified_users(group_id, days_old=7)
             
             # Update group activity status
-            import aiosqlite
-            async with aiosqlite.connect(self.db.db_path) as db:
+            async with self.db.pool.acquire_writer() as db:
                 await db.execute(
                     'UPDATE groups SET is_active = TRUE WHERE id = ?',
                     (group_id,)
@@ -484,8 +701,7 @@ Ready to protect your groups! 🔒
     async def _mark_group_inactive(self, group_id: int):
         """Mark group as inactive in database"""
         try:
-            import aiosqlite
-            async with aiosqlite.connect(self.db.db_path) as db:
+            async with self.db.pool.acquire_writer() as db:
                 await db.execute(
                     'UPDATE groups SET is_active = FALSE WHERE id = ?',
                     (group_id,)
@@ -506,9 +722,11 @@ Ready to protect your groups! 🔒
     
     async def start_background_tasks(self):
         """Start background maintenance tasks"""
-        asyncio.create_task(self.periodic_cleanup())
-        asyncio.create_task(self.health_check())
-        asyncio.create_task(self.join_leave_maintenance())
+        self.spawn_task(self.periodic_cleanup())
+        self.spawn_task(self.health_check())
+        self.spawn_task(self.join_leave_maintenance())
+        for _ in range(DELETE_WORKERS):
+            self.spawn_task(self.delete_worker())
         logger.info("✅ Background tasks started")
     
     async def join_leave_maintenance(self):
@@ -520,8 +738,7 @@ Ready to protect your groups! 🔒
                 logger.info("🧹 Running join/leave maintenance...")
                 
                 # Get groups with auto cleanup enabled
-                import aiosqlite
-                async with aiosqlite.connect(self.db.db_path) as db:
+                async with self.db.pool.acquire_reader() as db:
                     cursor = await db.execute(
                         'SELECT group_id, cleanup_hours FROM join_leave_settings WHERE auto_cleanup_history = TRUE'
                     )
@@ -549,24 +766,33 @@ Ready to protect your groups! 🔒
                 
                 logger.info("🧹 Running periodic cleanup...")
                 
-                # Clean up old unverified users (older than 7 days)
-                groups = await self.db.get_all_groups()
-                for group in groups:
-                    await self.db.cleanup_unverified_users(group['id'], days_old=7)
+                # Clean up old unverified users (older than 7 days) in all groups at once
+                removed = await self.db.cleanup_unverified_users_all(days_old=7)
                 
-                logger.info("✅ Periodic cleanup completed")
+                logger.info(f"✅ Periodic cleanup completed ({removed} unverified users removed)")
                 
             except Exception as e:
                 logger.error(f"❌ Error in periodic cleanup: {e}")
                 await asyncio.sleep(300)  # Wait 5 minutes on error
     
+    async def track_last_update(self, handler, event, data):
+        """Outer middleware stamping the time of every incoming update"""
+        self._last_update_ts = asyncio.get_running_loop().time()
+        return await handler(event, data)
+    
     async def health_check(self):
-        """Periodic health check"""
+        """Periodic health check, calling Telegram only when no updates arrived for a while"""
+        loop = asyncio.get_running_loop()
         while True:
             try:
-                await asyncio.sleep(1800)  # Run every 30 minutes
+                await asyncio.sleep(HEALTH_CHECK_INTERVAL)
                 
-                # Check bot status
+                idle = loop.time() - self._last_update_ts
+                if idle < HEALTH_STALE_AFTER:
+                    logger.debug(f"🏥 Health check passed - last update {idle:.0f}s ago")
+                    continue
+                
+                # Quiet for too long, check bot status
                 try:
                     me = await self.bot.get_me()
                     logger.debug(f"🏥 Health check passed - Bot: @{me.username}")
@@ -596,8 +822,14 @@ Ready to protect your groups! 🔒
             logger.info(f"👥 Join/Leave Remover: ✅ Active")
             logger.info(f"🔄 Starting message polling...")
             
-            # Start polling
-            await self.dp.start_polling(self.bot)
+            # Start polling, asking Telegram only for the update types we handle (incl. chat_member)
+            allowed_updates = self.dp.resolve_used_update_types()
+            logger.info(f"📬 Allowed updates: {', '.join(allowed_updates)}")
+            await self.dp.start_polling(
+                self.bot,
+                polling_timeout=self.config.POLLING_TIMEOUT,
+                allowed_updates=allowed_updates
+            )
             
         except Exception as e:
             logger.error(f"❌ Error during polling: {e}")
@@ -614,19 +846,11 @@ Ready to protect your groups! 🔒
             if self.bot and self.config.SUPERADMIN_ID:
                 try:
                     uptime = datetime.now() - self.startup_time
-                    shutdown_text = f"""
-🛑 **Bot Shutting Down**
-
-⏰ **Shutdown time:** {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}
-📊 **Uptime:** {str(uptime).split('.')[0]}
-
-🤖 **Bot:** @{self.config.BOT_USERNAME or 'Unknown'}
-💾 **Database:** Connections closed
-👥 **Join/Leave Remover:** Stopped
-🔄 **Status:** Graceful shutdown
-
-Bot will be offline until restart. 🔄
-                    """
+                    shutdown_text = SHUTDOWN_MSG_TEMPLATE.format_map({
+                        'time': datetime.now().strftime('%d.%m.%Y %H:%M:%S'),
+                        'uptime': str(uptime).split('.')[0],
+                        'username': self.config.BOT_USERNAME or 'Unknown',
+                    })
                     
                     await self.bot.send_message(
                         self.config.SUPERADMIN_ID,
@@ -636,15 +860,25 @@ Bot will be offline until restart. 🔄
                 except:
                     pass  # Don't fail shutdown on notification error
             
+            # Delete whatever is still queued before the session goes away
+            if self.bot:
+                await self.flush_delete_queue()
+            
             # Close bot session
             if self.bot:
                 await self.bot.session.close()
                 logger.info("✅ Bot session closed")
+            
+            # Close shared database connection
+            await self.db.close()
                 
             logger.info("✅ Bot shutdown completed successfully")
             
         except Exception as e:
             logger.error(f"❌ Error during shutdown: {e}")
+        
+        # Write out anything still queued for the log files
+        stop_log_listener()
 
 async def main():
     """Main function with enhanced error handling"""
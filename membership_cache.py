@@ -0,0 +1,36 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+MEMBERSHIP_CACHE_MAX_SIZE = 100_000
+MEMBERSHIP_CACHE_TTL = 300  # Seconds to trust a member status fetched from the API
+
+class MembershipCache:
+    """LRU cache of chat member statuses keyed by (chat_id, user_id)"""
+
+    def __init__(self, max_size: int = MEMBERSHIP_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: OrderedDict[Tuple[int, int], Tuple[str, float]] = OrderedDict()
+
+    def get(self, chat_id: int, user_id: int, max_age: float = MEMBERSHIP_CACHE_TTL) -> Optional[str]:
+        """Return the cached status, or None if missing or older than max_age"""
+        key = (chat_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        status, fetched_at = entry
+        if time.monotonic() - fetched_at > max_age:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return status
+
+    def set(self, chat_id: int, user_id: int, status: str):
+        """Remember a member status, evicting the least recently used entry when full"""
+        key = (chat_id, user_id)
+        self._entries[key] = (status, time.monotonic())
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
@@ -1,69 +1,249 @@
 import re
+from functools import lru_cache
 from typing import List, Optional
 from aiogram.types import Message, MessageEntity
 
+try:
+    import ahocorasick  # pyahocorasick: all keywords in one pass, optional
+except ImportError:
+    ahocorasick = None
+
+# URL patterns (various formats), fused into one alternation so the text is scanned once
+URL_PATTERNS = (
+    # Standard HTTP/HTTPS URLs
+    r'https?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
+    # Domain patterns (with common TLDs)
+    r'\b[a-zA-Z0-9][a-zA-Z0-9-]*[a-zA-Z0-9]*\.(?:com|org|net|edu|gov|mil|int|co|uz|ru|de|fr|uk|it|es|au|jp|cn|in|br)\b',
+    # Telegram links
+    r't\.me/[a-zA-Z0-9_]+',
+    r'telegram\.me/[a-zA-Z0-9_]+',
+    # Social media patterns
+    r'(?:instagram\.com|facebook\.com|twitter\.com|youtube\.com|tiktok\.com)/[a-zA-Z0-9_.]+',
+    # Short URLs
+    r'\b(?:bit\.ly|tinyurl\.com|short\.link|s\.id)/[a-zA-Z0-9]+',
+)
+_LINK_RE = re.compile('|'.join(f'(?:{p})' for p in URL_PATTERNS), re.IGNORECASE)
+
+# Any word.tld; the word before the dot is checked against common abbreviations.
+# The dot and TLD are a lookahead so "mr.scam.io" still yields "scam" after "mr"
+_DOMAIN_RE = re.compile(r'\b([a-zA-Z0-9-]+)(?=\.[a-zA-Z]{2,}\b)')
+DOMAIN_FALSE_POSITIVES = frozenset({
+    'vs', 'etc', 'inc', 'ltd', 'co', 'mr', 'mrs', 'dr', 'prof',
+    'jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec',
+    'mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun',
+})
+
+# Valid Telegram username mentions anywhere in text: an @username either not
+# preceded by a word character, or followed by space, end, or non-word char
+_MENTION_RE = re.compile(
+    r'(?:(?<!\w)|(?=@[a-zA-Z][a-zA-Z0-9_]{2,31}(?!\w)))'
+    r'@([a-zA-Z][a-zA-Z0-9_]{2,31})'
+)
+_USERNAME_VALID_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9_]*$')
+
+# Enhanced ad keywords for multiple languages, split by script so the
+# Cyrillic bucket is only scanned when the text has Cyrillic letters
+AD_KEYWORDS_ASCII = frozenset({
+    # English
+    # 'buy', 'sell', 'discount', 'sale', 'promo', 'offer', 'deal', 'cheap', 'free', 
+    # 'win', 'prize', 'earn money', 'work from home', 'make money', 'business opportunity',
+    # 'investment', 'profit', 'income', 'cash', 'dollars', 'payment',
+    
+    # # Uzbek
+    # 'sotib olaman', 'sotaman', 'chegirma', 'aksiya', 'reklama', 'daromad',
+    # 'pul', 'biznes', 'ish', 'vakansiya', 'foyda',
+    
+    # # Common spam phrases
+    # 'click here', 'limited time', 'act now', 'special offer', 'guarantee',
+    # 'no risk', 'free trial', 'instant', 'urgent', 'exclusive',
+})
+
+AD_KEYWORDS_CYRILLIC = frozenset({
+    # # Russian
+    # 'продам', 'куплю', 'скидка', 'акция', 'реклама', 'заработок', 'деньги',
+    # 'бизнес', 'доход', 'прибыль', 'инвестиции', 'работа', 'вакансия',
+})
+
+AD_KEYWORDS = AD_KEYWORDS_ASCII | AD_KEYWORDS_CYRILLIC
+
+_CYRILLIC_RE = re.compile('[\u0400-\u04ff]')
+
+# Phone number patterns (often used in ads)
+_PHONE_RES = (
+    re.compile(r'\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9}'),
+    re.compile(r'\d{3,4}[-.\s]?\d{2,3}[-.\s]?\d{2,3}[-.\s]?\d{2,3}'),
+)
+
+# Fewest digits any phone pattern can match
+PHONE_MIN_DIGITS = 4
+
+def _build_automaton(keywords):
+    """Build an Aho-Corasick automaton for the keywords, or None when unavailable"""
+    if ahocorasick is None or not keywords:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+def _build_keyword_re(keywords):
+    """Compile the keywords into one alternation, or None when there are none"""
+    if not keywords:
+        return None
+    return re.compile('|'.join(map(re.escape, sorted(keywords, key=len, reverse=True))))
+
+_AD_BUCKETS = (
+    (AD_KEYWORDS_ASCII, _build_automaton(AD_KEYWORDS_ASCII), _build_keyword_re(AD_KEYWORDS_ASCII), False),
+    (AD_KEYWORDS_CYRILLIC, _build_automaton(AD_KEYWORDS_CYRILLIC), _build_keyword_re(AD_KEYWORDS_CYRILLIC), True),
+)
+
+def count_ad_keywords(text: str, stop_at: int = 2) -> int:
+    """Count distinct ad keywords in lowercased text, stopping once stop_at are found"""
+    found = set()
+    has_cyrillic = None
+    for keywords, automaton, keyword_re, cyrillic in _AD_BUCKETS:
+        if not keywords:
+            continue
+        if cyrillic:
+            if has_cyrillic is None:
+                has_cyrillic = _CYRILLIC_RE.search(text) is not None
+            if not has_cyrillic:
+                continue
+        
+        if automaton is not None:
+            for _, keyword in automaton.iter(text):
+                found.add(keyword)
+                if len(found) >= stop_at:
+                    return len(found)
+        else:
+            # One regex pass rules out texts without any keyword; only a hit
+            # needs the per-keyword scan, which also counts overlapping keywords
+            if not keyword_re.search(text):
+                continue
+            for keyword in keywords:
+                if keyword in text:
+                    found.add(keyword)
+                    if len(found) >= stop_at:
+                        return len(found)
+    return len(found)
+
+# Results of the text-only checks are memoized: has_links, is_potential_ad and
+# is_suspicious_content share them, and edits and spam floods repeat texts
+TEXT_CHECK_CACHE_SIZE = 2048
+
+@lru_cache(maxsize=TEXT_CHECK_CACHE_SIZE)
+def _text_has_links(text: str) -> bool:
+    """Check message text (entities aside) for links"""
+    # Every pattern below needs a dot, except scheme URLs like http://localhost
+    has_dot = '.' in text
+    if not has_dot and '://' not in text:
+        return False
+    
+    # Check for URL patterns (various formats)
+    if _LINK_RE.search(text):
+        return True
+    
+    # Check for domains with dots but exclude common false positives
+    if has_dot:
+        # Lazily, so the first real domain stops the scan
+        for match in _DOMAIN_RE.finditer(text):
+            if match.group(1).lower() not in DOMAIN_FALSE_POSITIVES:
+                return True
+    
+    return False
+
+def _ad_reasons(text: str):
+    """Yield a reason for each advertisement check the lowercased text trips, in check order"""
+    # Check for ad keywords (multiple ad keywords = more likely spam)
+    keyword_count = count_ad_keywords(text)
+    if keyword_count >= 2:
+        yield "multiple ad keywords"
+    
+    # Check for excessive caps (shouting = potential spam). The text is already
+    # lowercased, so this only catches capitals with no lowercase form, such as
+    # the "fancy font" math letters (𝐒𝐀𝐋𝐄, ℂ, ℍ) spammers use to dodge filters.
+    # Lowercased ASCII has no capitals left, and isascii() is a constant-time flag check
+    if len(text) > 20 and not text.isascii():
+        # Count with C-level map() passes; letters only need counting if any are uppercase
+        caps_count = sum(map(str.isupper, text))
+        if caps_count:
+            alpha_count = sum(map(str.isalpha, text))
+            if alpha_count and caps_count / alpha_count > 0.7:  # More than 70% uppercase letters
+                yield "excessive caps"
+    
+    # Check for repetitive patterns (spam characteristic)
+    if len(text) > 50:
+        # Check for repeated phrases
+        words = text.split()
+        if len(words) >= 4:
+            # Look for a word pair that appears again later (without overlapping itself)
+            first_seen = {}
+            for i, pair in enumerate(zip(words, words[1:])):
+                if i - first_seen.setdefault(pair, i) >= 2:
+                    yield "repeated phrases"
+                    break
+    
+    # Check for phone number patterns (often used in ads).
+    # A phone number only counts together with an ad keyword, and the
+    # shortest pattern match has 4 digits, so skip the regexes otherwise.
+    if keyword_count > 0 and sum(map(str.isdecimal, text)) >= PHONE_MIN_DIGITS:
+        for pattern in _PHONE_RES:
+            if pattern.search(text):
+                # If message contains phone number and ad keywords, likely spam
+                yield "phone number with ad keywords"
+                break
+
+@lru_cache(maxsize=TEXT_CHECK_CACHE_SIZE)
+def _text_is_potential_ad(text: str) -> bool:
+    """Check lowercased message text for advertisement patterns, stopping at the first hit"""
+    return next(_ad_reasons(text), None) is not None
+
+# Entity types that mark a link or text formatting
+_LINK_ENTITY_TYPES = frozenset({'url', 'text_link'})
+_FORMATTING_ENTITY_TYPES = frozenset({'bold', 'italic', 'underline', 'strikethrough'})
+
+def _has_char_run(text: str, length: int) -> bool:
+    """Check for a run of at least `length` identical characters in one pass"""
+    previous = None
+    run = 0
+    for char in text:
+        if char == previous:
+            run += 1
+            if run >= length:
+                return True
+        else:
+            previous = char
+            run = 1
+    return False
+
 class MessageAnalyzer:
     @staticmethod
     def has_links(message: Message) -> bool:
         """Check if message contains links with improved detection"""
-        if not message.text and not message.caption:
-            return False
-        
         text = message.text or message.caption
+        if not text:
+            return False
         
         # Check for entities first (most reliable)
-        if message.entities:
-            for entity in message.entities:
-                if entity.type in ['url', 'text_link']:
-                    return True
-        
-        if message.caption_entities:
-            for entity in message.caption_entities:
-                if entity.type in ['url', 'text_link']:
-                    return True
-        
-        # Check for URL patterns (various formats)
-        url_patterns = [
-            # Standard HTTP/HTTPS URLs
-            r'https?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
-            # Domain patterns (with common TLDs)
-            r'\b[a-zA-Z0-9][a-zA-Z0-9-]*[a-zA-Z0-9]*\.(?:com|org|net|edu|gov|mil|int|co|uz|ru|de|fr|uk|it|es|au|jp|cn|in|br)\b',
-            # Telegram links
-            r't\.me/[a-zA-Z0-9_]+',
-            r'telegram\.me/[a-zA-Z0-9_]+',
-            # Social media patterns
-            r'(?:instagram\.com|facebook\.com|twitter\.com|youtube\.com|tiktok\.com)/[a-zA-Z0-9_.]+',
-            # Short URLs
-            r'\b(?:bit\.ly|tinyurl\.com|short\.link|s\.id)/[a-zA-Z0-9]+',
-        ]
-        
-        for pattern in url_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return True
-        
-        # Check for domains with dots but exclude common false positives
-        domain_pattern = r'\b[a-zA-Z0-9-]+\.[a-zA-Z]{2,}\b'
-        potential_domains = re.findall(domain_pattern, text)
+        if any(entity.type in _LINK_ENTITY_TYPES for entity in message.entities or ()):
+            return True
         
-        # Filter out common false positives
-        false_positives = {
-            'vs.', 'etc.', 'inc.', 'ltd.', 'co.', 'mr.', 'mrs.', 'dr.', 'prof.',
-            'jan.', 'feb.', 'mar.', 'apr.', 'may.', 'jun.', 'jul.', 'aug.', 'sep.', 'oct.', 'nov.', 'dec.',
-            'mon.', 'tue.', 'wed.', 'thu.', 'fri.', 'sat.', 'sun.',
-        }
-        
-        for domain in potential_domains:
-            if domain.lower() not in false_positives:
-                return True
+        if any(entity.type in _LINK_ENTITY_TYPES for entity in message.caption_entities or ()):
+            return True
         
-        return False
+        return _text_has_links(text)
     
     @staticmethod
     def extract_mentions(message: Message) -> List[str]:
         """Extract all mentions from message with improved accuracy - handles mentions anywhere in text"""
-        mentions = []
+        mentions = {}  # Lowercased usernames; a dict keeps first-seen order without duplicates
         text = message.text or message.caption or ""
         
+        # Entity and regex mentions both start with '@'
+        if '@' not in text:
+            return []
+        
         # Method 1: Extract from entities (most reliable)
         entities_to_check = []
         if message.entities:
@@ -71,123 +251,49 @@ class MessageAnalyzer:
         if message.caption_entities:
             entities_to_check.extend(message.caption_entities)
         
+        # Entity offsets are in UTF-16 code units, so slice an encoded copy (made once)
+        utf16_text = text.encode('utf-16-le') if entities_to_check else b''
         for entity in entities_to_check:
             if entity.type == 'mention':
-                mention = text[entity.offset:entity.offset + entity.length]
+                start = entity.offset * 2
+                mention = utf16_text[start:start + entity.length * 2].decode('utf-16-le', errors='ignore')
                 username = mention.lstrip('@').lower()
                 if username and len(username) >= 3:  # Minimum username length
-                    if username not in mentions:  # Avoid duplicates
-                        mentions.append(username)
+                    mentions[username] = None
         
         # Method 2: Extract with regex (catches mentions entities might miss)
         # This handles cases like "some message @username more text"
-        # Valid Telegram username pattern - matches mentions anywhere in text
-        mention_patterns = [
-            # Standard @username pattern
-            r'@([a-zA-Z][a-zA-Z0-9_]{2,31})(?=\s|$|[^\w])',  # Username followed by space, end, or non-word char
-            # Handle cases where @ is at word boundary
-            r'(?<!\w)@([a-zA-Z][a-zA-Z0-9_]{2,31})',  # @ not preceded by word character
-        ]
-        
-        for pattern in mention_patterns:
-            regex_mentions = re.findall(pattern, text)
-            for mention in regex_mentions:
-                mention_lower = mention.lower()
-                if mention_lower not in mentions:  # Avoid duplicates
-                    mentions.append(mention_lower)
+        for mention in _MENTION_RE.findall(text):
+            mentions[mention.lower()] = None
         
         # Method 3: Additional cleanup and validation
+        # (3-32 characters, Telegram's username limits, with no invalid characters)
         validated_mentions = []
         for mention in mentions:
-            # Clean and validate each mention
-            clean_mention = mention.strip().lower()
-            
-            # Skip empty or too short mentions
-            if not clean_mention or len(clean_mention) < 3:
-                continue
-                
-            # Skip mentions with invalid characters
-            if not re.match(r'^[a-zA-Z][a-zA-Z0-9_]*$', clean_mention):
-                continue
-                
-            # Skip if too long (Telegram max is 32 chars)
-            if len(clean_mention) > 32:
-                continue
-                
-            validated_mentions.append(clean_mention)
+            clean_mention = mention.strip()
+            if 3 <= len(clean_mention) <= 32 and _USERNAME_VALID_RE.match(clean_mention):
+                validated_mentions.append(clean_mention)
         
         return validated_mentions
     
     @staticmethod
     def is_potential_ad(message: Message) -> bool:
         """Check if message might be an advertisement with improved detection"""
-        if not message.text and not message.caption:
+        text = message.text or message.caption
+        if not text:
             return False
         
-        text = (message.text or message.caption or "").lower()
-        
-        # Enhanced ad keywords for multiple languages
-        ad_keywords = [
-            # English
-            # 'buy', 'sell', 'discount', 'sale', 'promo', 'offer', 'deal', 'cheap', 'free', 
-            # 'win', 'prize', 'earn money', 'work from home', 'make money', 'business opportunity',
-            # 'investment', 'profit', 'income', 'cash', 'dollars', 'payment',
-            
-            # # Russian
-            # 'продам', 'куплю', 'скидка', 'акция', 'реклама', 'заработок', 'деньги',
-            # 'бизнес', 'доход', 'прибыль', 'инвестиции', 'работа', 'вакансия',
-            
-            # # Uzbek
-            # 'sotib olaman', 'sotaman', 'chegirma', 'aksiya', 'reklama', 'daromad',
-            # 'pul', 'biznes', 'ish', 'vakansiya', 'foyda',
-            
-            # # Common spam phrases
-            # 'click here', 'limited time', 'act now', 'special offer', 'guarantee',
-            # 'no risk', 'free trial', 'instant', 'urgent', 'exclusive',
-        ]
-        
-        # Check for ad keywords
-        keyword_count = 0
-        for keyword in ad_keywords:
-            if keyword in text:
-                keyword_count += 1
-                if keyword_count >= 2:  # Multiple ad keywords = more likely spam
-                    return True
-        
-       
-        
-        # Check for excessive caps (shouting = potential spam)
-        if len(text) > 20:
-            caps_count = sum(1 for char in text if char.isupper())
-            caps_ratio = caps_count / len([c for c in text if c.isalpha()])
-            if caps_ratio > 0.7:  # More than 70% uppercase letters
-                return True
-        
-        # Check for repetitive patterns (spam characteristic)
-        if len(text) > 50:
-            # Check for repeated phrases
-            words = text.split()
-            if len(words) >= 4:
-                # Look for repeated sequences of 2+ words
-                for i in range(len(words) - 3):
-                    phrase = ' '.join(words[i:i+2])
-                    remaining_text = ' '.join(words[i+2:])
-                    if phrase in remaining_text:
-                        return True
-        
-        # Check for phone number patterns (often used in ads)
-        phone_patterns = [
-            r'\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9}',
-            r'\d{3,4}[-.\s]?\d{2,3}[-.\s]?\d{2,3}[-.\s]?\d{2,3}',
-        ]
-        
-        for pattern in phone_patterns:
-            if re.search(pattern, text):
-                # If message contains phone number and ad keywords, likely spam
-                if keyword_count > 0:
-                    return True
+        return _text_is_potential_ad(text.lower())
+    
+    @staticmethod
+    def is_potential_ad_debug(message: Message) -> tuple[bool, str, int]:
+        """Run every advertisement check and return (is_ad, reasons, number of checks tripped)"""
+        text = message.text or message.caption
+        if not text:
+            return False, "No text", 0
         
-        return False
+        reasons = list(_ad_reasons(text.lower()))
+        return bool(reasons), "; ".join(reasons) or "No ad indicators found", len(reasons)
     
     @staticmethod
     def is_suspicious_content(message: Message) -> tuple[bool, str]:
@@ -195,43 +301,51 @@ class MessageAnalyzer:
         Comprehensive content analysis that returns if content is suspicious
         and the reason why.
         """
-        if not message.text and not message.caption:
+        text = message.text or message.caption
+        if not text:
             return False, ""
         
-        text = (message.text or message.caption or "")
+        # Check for links, counting formatting entities on the same pass
+        formatting_count = 0
+        if message.entities:
+            for entity in message.entities:
+                if entity.type in _LINK_ENTITY_TYPES:
+                    return True, "contains links"
+                if entity.type in _FORMATTING_ENTITY_TYPES:
+                    formatting_count += 1
+        
+        if message.caption_entities:
+            for entity in message.caption_entities:
+                if entity.type in _LINK_ENTITY_TYPES:
+                    return True, "contains links"
         
-        # Check for links
-        if MessageAnalyzer.has_links(message):
+        if _text_has_links(text):
             return True, "contains links"
         
         # Check for potential ads
-        if MessageAnalyzer.is_potential_ad(message):
+        if _text_is_potential_ad(text.lower()):
             return True, "appears to be advertisement"
         
         # Check for spam patterns
         if len(text) > 10:
             # Too many repeated characters
-            for char in text:
-                if char * 10 in text:  # 10+ same characters in a row
-                    return True, "contains spam patterns"
+            if _has_char_run(text, 10):  # 10+ same characters in a row
+                return True, "contains spam patterns"
         
         # Check for excessive formatting
-        if message.entities:
-            formatting_count = sum(1 for entity in message.entities 
-                                 if entity.type in ['bold', 'italic', 'underline', 'strikethrough'])
-            if formatting_count > len(text.split()) // 2:  # More formatting than half the words
-                return True, "excessive formatting (potential spam)"
+        if formatting_count and formatting_count > len(text.split()) // 2:  # More formatting than half the words
+            return True, "excessive formatting (potential spam)"
         
         return False, ""
 
+# Markdown special characters mapped to their escaped form
+_MD_ESCAPE = str.maketrans({char: f'\\{char}' for char in '_*[]()~`>#+-=|{}.!'})
+
 class TextFormatter:
     @staticmethod
     def escape_markdown(text: str) -> str:
         """Escape markdown special characters"""
-        special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-        for char in special_chars:
-            text = text.replace(char, f'\\{char}')
-        return text
+        return text.translate(_MD_ESCAPE)
     
     @staticmethod
     def get_user_mention(user) -> str: